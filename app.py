@@ -1,31 +1,76 @@
-import json  # Standard library
-import os    # Standard library
-
+import logging    # Standard library
+import os         # Standard library
+import queue      # Standard library
+import sqlite3    # Standard library
+import threading  # Standard library
+import time       # Standard library
+import uuid       # Standard library
+from types import MappingProxyType  # Standard library
+
+import httpx           # Third-party library
+from cachetools import TTLCache  # Third-party library
+import orjson          # Third-party library
 import streamlit as st # Third-party library
-import requests        # Third-party library
 
 
 # --- Configuration ---
 PERSONAL_INFO_FILE = "personal_info.json"
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+# Point this at an https:// reverse proxy in front of Ollama to get HTTP/2.
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_API_URL = f"{OLLAMA_BASE_URL}/api/chat"
 GEMMA_MODEL_NAME = "gemma3"
+OLLAMA_KEEP_ALIVE = "24h"  # How long Ollama keeps the model loaded after a request
+# Requests Ollama decodes together in one batch, used to size the client pool. Set
+# it to match the Ollama server's OLLAMA_NUM_PARALLEL (this process's environment
+# is not necessarily the server's). Ollama treats 0 as "auto", so 0 or any other
+# non-positive value falls back to 4 rather than a pool with no connections.
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+if OLLAMA_NUM_PARALLEL <= 0:
+    OLLAMA_NUM_PARALLEL = 4
+OLLAMA_NUM_CTX = 8192  # Large enough that the system prompt is never truncated away
+MAX_TURNS = 12         # Number of recent user/assistant exchanges sent to the LLM
+# Chat persistence is opt-in. A conversation is keyed by a `sid` query parameter
+# in the page URL, so anyone the URL is shared with can read and continue that
+# conversation. Only enable this where that is acceptable.
+PERSIST_CHAT = os.getenv("PORTFOLIO_PERSIST_CHAT", "0") == "1"
+CHAT_DB_FILE = "chat.db"
+CHAT_HISTORY_TTL = 30 * 24 * 3600  # Seconds before stored messages are purged
+# How portfolio sections are shown: "hidden" (anchors only), "expander" or "headers"
+DISPLAY_MODE = os.getenv("PORTFOLIO_DISPLAY", "hidden")
+
+logger = logging.getLogger(__name__)
 
 # --- Load Personal Information ---
-@st.cache_data(show_spinner="Loading personal data...")
+# cache_resource hands back the same object on every rerun instead of hashing and
+# copying it like cache_data does. That object is shared by every session, so it
+# is wrapped in a read-only proxy; the proxy is shallow, so nested values such as
+# the project dicts must still be treated as read-only.
+@st.cache_resource(show_spinner="Loading personal data...")
 def load_personal_info(file_path):
     if not os.path.exists(file_path):
         st.error(f"Error: Personal information file '{file_path}' not found. Please create it.")
         return None
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+        with open(file_path, "rb") as f:
+            data = orjson.loads(f.read())
+    except orjson.JSONDecodeError:
         st.error(f"Error: Could not parse '{file_path}'. Please check its JSON format for errors (e.g., missing commas, unclosed brackets).")
         return None
     except Exception as e:
         st.error(f"An unexpected error occurred while loading '{file_path}': {e}")
         return None
 
+    # Classify each project once at load time so later code can check a flag
+    # instead of re-scanning project names on every rerun.
+    for project in data.get('projects', []):
+        project['_is_client'] = "client project" in project['name'].lower()
+        project['_type_label'] = "Client Project" if project['_is_client'] else "Personal Project"
+    data['_skills_joined'] = ', '.join(data.get('skills', []))
+    data['_greeting'] = f"Hello! I am a chatbot assistant of {data['name']}. I was created by {data['name']} to help you learn more about his professional background. How can I assist you today? You can ask me about his **skills**, **projects**, **education**, or **how to get in touch**!"
+    data['_client_projects'] = [p for p in data.get('projects', []) if p['_is_client']]
+    data['_personal_projects'] = [p for p in data.get('projects', []) if not p['_is_client']]
+    return MappingProxyType(data)
+
 personal_info = load_personal_info(PERSONAL_INFO_FILE)
 
 if personal_info is None:
@@ -42,29 +87,195 @@ SECTIONS = {
     "contact": "contact-jash"
 }
 
-# --- Ollama Interaction Function ---
-def get_gemma_response(prompt, model_name=GEMMA_MODEL_NAME):
-    headers = {"Content-Type": "application/json"}
-    data = {
+SECTION_TITLES = {
+    "about": "About Jash",
+    "skills": "My Skills",
+    "education": "My Education",
+    "projects": "My Projects",
+    "contact": "Contact Jash"
+}
+
+# All anchor targets in one HTML snippet, so they render as a single element.
+_ANCHORS_HTML = "".join(f"<div id='{anchor}'></div>" for anchor in SECTIONS.values())
+
+# --- Ollama HTTP Client ---
+# A single pooled client keeps connections to Ollama alive between turns instead
+# of reconnecting for every message. It negotiates HTTP/2 when OLLAMA_BASE_URL is
+# an https:// proxy that supports it; httpx only speaks HTTP/2 over TLS, so the
+# default plain-http localhost URL stays on HTTP/1.1. st.cache_resource shares the
+# client across reruns and user sessions without hashing or copying it, and
+# httpx.Client is safe to share between Streamlit's per-session script threads.
+#
+# Each user session runs in its own thread, so concurrent chats already reach
+# Ollama as concurrent requests over this pool, where its scheduler batches them
+# into shared decode steps. One warm connection is kept per configured slot.
+@st.cache_resource
+def _http_client():
+    transport = httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(
+            max_keepalive_connections=OLLAMA_NUM_PARALLEL,
+            max_connections=OLLAMA_NUM_PARALLEL * 2,
+        ),
+    )
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(120.0, connect=3.05))
+
+def _chat_payload(model_name, messages, stream):
+    # Shared by the warm-up and real requests: Ollama reloads the model whenever
+    # keep_alive or runner options differ from the loaded ones, so both must match.
+    return {
         "model": model_name,
-        "prompt": prompt,
-        "stream": False
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {"num_ctx": OLLAMA_NUM_CTX}
     }
+
+# Open the keep-alive connection and get the model weights loaded once per server
+# process, so the first user question does not pay for either. An empty message
+# list makes /api/chat load the model without generating anything. A failure
+# raises so st.cache_resource does not remember it, and the warm-up is retried on
+# the next full rerun; a real request reports the error to the user.
+@st.cache_resource(show_spinner="Warming up Gemma...")
+def _prewarm_ollama(model_name=GEMMA_MODEL_NAME):
+    client = _http_client()
+    client.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=2).raise_for_status()
+    client.post(
+        OLLAMA_API_URL,
+        content=orjson.dumps(_chat_payload(model_name, [], stream=False)),
+        headers={"Content-Type": "application/json"},
+        timeout=60,
+    ).raise_for_status()
+
+try:
+    _prewarm_ollama()
+except httpx.HTTPError:
+    pass
+
+# --- Response Cache ---
+# Portfolio questions repeat a lot ("what are your skills?"), so finished replies
+# are kept in a bounded, process-wide LRU keyed on the model and the exact
+# messages sent. A lock guards it because sessions run in separate threads.
+@st.cache_resource
+def _response_cache():
+    return TTLCache(maxsize=256, ttl=3600), threading.Lock()
+
+# --- Ollama Interaction Function ---
+def get_gemma_response_stream(messages, model_name=GEMMA_MODEL_NAME):
+    """Yields Gemma's reply chunk by chunk as Ollama generates it."""
+    cache, cache_lock = _response_cache()
+    cache_key = (model_name, orjson.dumps(messages))
+    with cache_lock:
+        cached = cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    headers = {"Content-Type": "application/json"}
+    data = _chat_payload(model_name, messages, stream=True)
     try:
-        response = requests.post(OLLAMA_API_URL, headers=headers, data=json.dumps(data))
-        response.raise_for_status()
-        return response.json()["response"]
-    except requests.exceptions.ConnectionError:
+        with _http_client().stream("POST", OLLAMA_API_URL, headers=headers, content=orjson.dumps(data)) as response:
+            response.raise_for_status()
+            parts = []
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                if chunk.get("error"):
+                    st.error(f"Ollama returned an error: {chunk['error']}. Check Ollama logs for details.")
+                    return
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    parts.append(content)
+                    yield content
+                if chunk.get("done"):
+                    # Only complete replies are cached, never ones cut off by an error.
+                    with cache_lock:
+                        cache[cache_key] = "".join(parts)
+                    break
+    except httpx.ConnectError:
         st.error("Could not connect to Ollama server. Please ensure Ollama is running and Gemma 3 is pulled (`ollama serve` in terminal).")
-        return None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         st.error(f"Error calling Ollama API: {e}. Check Ollama logs for details.")
-        return None
+    except orjson.JSONDecodeError as e:
+        st.error(f"Could not parse the response from Ollama: {e}. Check Ollama logs for details.")
+
+# --- Chat History Persistence ---
+# When enabled, messages are saved to SQLite so a conversation survives a page
+# refresh. Writes go through a queue drained by a background thread, so the UI never
+# waits on disk. The writer keeps only the last MAX_TURNS exchanges per session and
+# purges anything older than CHAT_HISTORY_TTL, which bounds the file size. Readers
+# open their own connection, and WAL mode lets those reads run alongside writes.
+@st.cache_resource
+def _chat_store():
+    conn = sqlite3.connect(CHAT_DB_FILE, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS messages (session_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, ts REAL NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts)")
+    pending = queue.Queue()
+
+    def _flush():
+        # Only this thread uses `conn` from here on.
+        while True:
+            session_id, role, content, ts = pending.get()
+            try:
+                conn.execute("INSERT INTO messages (session_id, role, content, ts) VALUES (?, ?, ?, ?)", (session_id, role, content, ts))
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM messages WHERE session_id = ? ORDER BY ts DESC, rowid DESC LIMIT ?)",
+                    (session_id, session_id, MAX_TURNS * 2),
+                )
+                conn.execute("DELETE FROM messages WHERE ts < ?", (ts - CHAT_HISTORY_TTL,))
+            except sqlite3.Error:
+                # Losing one history row is better than stopping the writer thread.
+                logger.exception("Could not save chat message to '%s'", CHAT_DB_FILE)
+
+    threading.Thread(target=_flush, daemon=True).start()
+    return pending
+
+def _load_recent_messages(session_id, limit=MAX_TURNS * 2):
+    _chat_store()  # Make sure the schema exists.
+    conn = sqlite3.connect(CHAT_DB_FILE)
+    try:
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY ts DESC, rowid DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+    except sqlite3.Error:
+        logger.exception("Could not load chat history from '%s'", CHAT_DB_FILE)
+        return []
+    finally:
+        conn.close()
+    return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+def _append_message(role, content):
+    st.session_state.messages.append({"role": role, "content": content})
+    if PERSIST_CHAT:
+        _chat_store().put((st.session_state.session_id, role, content, time.time()))
 
 # --- Agentic Logic (Personal Knowledge Base & Prompt Engineering) ---
-def create_agentic_prompt(user_query):
-    if not personal_info:
-        return "I apologize, but my personal information is not available at the moment."
+# The system prompt only depends on personal_info, so it is built once and cached.
+# It is sent as an unchanging system message so Ollama can reuse its KV cache for
+# this prefix instead of re-processing it on every turn.
+# The leading underscore on `_info` tells Streamlit not to hash it; personal_info
+# is itself a single cached object, and the reload button clears this cache too.
+# `display_mode` is part of the key because the navigation instructions describe
+# whether the sections are actually visible on the page.
+@st.cache_resource(show_spinner=False)
+def _build_static_prompt(display_mode, _info):
+    personal_info = _info
+
+    if display_mode == "headers":
+        section_visibility = "The sections are displayed on the page below the chat. If"
+        details_note = "."
+    elif display_mode == "expander":
+        section_visibility = "The sections are shown on the page below the chat as collapsed expanders. If"
+        details_note = ", where the user can expand the section to read them."
+    else:
+        section_visibility = "The information is not displayed on the page by default. However, if"
+        details_note = ", even if those details are currently hidden."
 
     identity_statement = f"You are an AI chatbot assistant of {personal_info['name']}. You were created by {personal_info['name']} to provide accurate and helpful information about his professional background, skills, education, and projects. Always introduce yourself with this identity if asked 'who are you?' or similar questions."
 
@@ -74,7 +285,7 @@ def create_agentic_prompt(user_query):
     - **Name:** {personal_info['name']}
     - **Occupation:** {personal_info['occupation']}
     - **About Me:** {personal_info['about_me']}
-    - **Skills:** {', '.join(personal_info['skills'])}
+    - **Skills:** {personal_info['_skills_joined']}
     - **Education:** {personal_info['education']}
     - **Contact Email:** {personal_info['contact_email']}
     - **LinkedIn:** {personal_info['linkedin_profile']}
@@ -84,12 +295,14 @@ def create_agentic_prompt(user_query):
     **Projects:**
     """
     # Explicitly list projects with their types for Gemma to learn
-    for project in personal_info['projects']:
-        project_type = "Client Project" if "client project" in project['name'].lower() else "Personal Project"
-        system_intro += f"- **{project['name']} ({project_type})**: {project['description']}\n"
+    project_lines = [
+        f"- **{project['name']} ({project['_type_label']})**: {project['description']}\n"
+        for project in personal_info['projects']
+    ]
+    system_intro += "".join(project_lines)
 
 
-    general_instructions = """
+    general_instructions = f"""
     **Primary Goal:** Answer user questions about Jash Kothari's professional profile using the provided information.
 
     **Specific Answering Instructions:**
@@ -99,7 +312,7 @@ def create_agentic_prompt(user_query):
     - If asked for contact information, provide the email, LinkedIn, GitHub, and portfolio website directly.
 
     **Navigation/Link Instructions (for specific requests ONLY):**
-    - The information is not displayed on the page by default. However, if the user explicitly asks to "go to", "show me", or "take me to" a specific section (e.g., "show me your skills", "go to projects", "tell me about your education", "contact info"), you *can* provide a clickable Markdown link to that section.
+    - {section_visibility} the user explicitly asks to "go to", "show me", or "take me to" a specific section (e.g., "show me your skills", "go to projects", "tell me about your education", "contact info"), you *can* provide a clickable Markdown link to that section.
     - **ONLY provide links if explicitly asked to navigate.** Otherwise, provide direct answers.
     - Here are the available sections and their corresponding anchor links:
         - About Jash: [About Jash](#about-jash)
@@ -107,7 +320,7 @@ def create_agentic_prompt(user_query):
         - My Education: [My Education](#my-education)
         - My Projects: [My Projects](#my-projects)
         - Contact Jash: [Contact Jash](#contact-jash)
-    - If the user asks for *content* of a section, answer directly first, and *then* you can offer the relevant link for "more details" if applicable, even if those details are currently hidden.
+    - If the user asks for *content* of a section, answer directly first, and *then* you can offer the relevant link for "more details" if applicable{details_note}
 
     **General Chat Behavior:**
     - Be polite, concise, and helpful.
@@ -115,8 +328,23 @@ def create_agentic_prompt(user_query):
     - Do not invent information about Jash Kothari that is not explicitly provided. If you cannot find the answer in the provided information, simply state that you don't have that specific detail about Jash Kothari.
     """
 
-    full_prompt_for_llm = f"{system_intro}\n{general_instructions}\n\nUser Query: {user_query}"
-    return full_prompt_for_llm
+    return f"{system_intro}\n{general_instructions}"
+
+PREFIX = _build_static_prompt(DISPLAY_MODE, personal_info)
+
+def _windowed_history(messages, max_turns=MAX_TURNS):
+    # Keep the opening greeting plus the most recent turns so prompt length stays
+    # bounded no matter how long the conversation gets.
+    limit = max_turns * 2
+    if len(messages) <= limit:
+        return list(messages)
+    return [messages[0]] + messages[-(limit - 1):]
+
+def create_agentic_prompt(history):
+    if not personal_info:
+        return [{"role": "assistant", "content": "I apologize, but my personal information is not available at the moment."}]
+
+    return [{"role": "system", "content": PREFIX}] + history
 
 # --- Streamlit UI ---
 
@@ -126,43 +354,100 @@ st.title(f"Hi, I'm {personal_info['name']}'s AI Assistant!")
 st.write(f"Ask me anything about {personal_info['name']}'s skills, experience, projects, or how to get in touch.")
 
 
+# The session id lives in the URL so a refresh picks the same conversation back up
+# (see PERSIST_CHAT for what that means when the URL is shared).
+if PERSIST_CHAT and "session_id" not in st.session_state:
+    session_id = st.query_params.get("sid")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params["sid"] = session_id
+    st.session_state.session_id = session_id
+
 if "messages" not in st.session_state:
     st.session_state.messages = [
-        {"role": "assistant", "content": f"Hello! I am a chatbot assistant of {personal_info['name']}. I was created by {personal_info['name']} to help you learn more about his professional background. How can I assist you today? You can ask me about his **skills**, **projects**, **education**, or **how to get in touch**!"}
+        {"role": "assistant", "content": personal_info['_greeting']}
     ]
-
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+    if PERSIST_CHAT:
+        st.session_state.messages += _load_recent_messages(st.session_state.session_id)
+
+# All chat bubbles live in one container so a new turn is appended in place after
+# the history. Streamlit rebuilds the page on every rerun, so earlier messages must
+# still be re-emitted here (skipping them would erase them); the frontend keeps
+# unchanged elements at the same position instead of re-creating them.
+chat_container = st.container()
+with chat_container:
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
 
 if prompt := st.chat_input(f"Ask me something about {personal_info['name']} or anything else!"):
-    st.chat_message("user").markdown(prompt)
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    chat_container.chat_message("user").markdown(prompt)
+    _append_message("user", prompt)
 
-    with st.spinner("Thinking..."):
-        agentic_query = create_agentic_prompt(prompt)
-        response = get_gemma_response(agentic_query)
+    history = _windowed_history(st.session_state.messages)
+    agentic_messages = create_agentic_prompt(history)
+    # write_stream updates a single placeholder element as chunks arrive.
+    with chat_container.chat_message("assistant"):
+        response = st.write_stream(get_gemma_response_stream(agentic_messages))
 
     if response:
-        with st.chat_message("assistant"):
-            st.markdown(response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
-
-# --- HIDDEN SECTIONS WITH ANCHOR TAGS (NO VISIBLE CONTENT BY DEFAULT) ---
-# These are still rendered in the background to provide targets for chatbot's links.
-# They are empty here, but the anchor IDs exist.
+        _append_message("assistant", response)
+
+# --- Portfolio Sections ---
+def _render_section_content(key):
+    if key == "about":
+        st.write(f"**{personal_info['occupation']}**")
+        st.write(personal_info['about_me'])
+    elif key == "skills":
+        st.write(personal_info['_skills_joined'])
+    elif key == "education":
+        st.write(personal_info['education'])
+    elif key == "projects":
+        st.subheader("Client Projects")
+        for project in personal_info['_client_projects']:
+            st.markdown(f"- **{project['name']}**: {project['description']}")
+        st.subheader("Personal Projects")
+        for project in personal_info['_personal_projects']:
+            st.markdown(f"- **{project['name']}**: {project['description']}")
+    elif key == "contact":
+        st.markdown(
+            f"- **Email:** {personal_info['contact_email']}\n"
+            f"- **LinkedIn:** {personal_info['linkedin_profile']}\n"
+            f"- **GitHub:** {personal_info['github_profile']}\n"
+            f"- **Portfolio Website:** {personal_info['portfolio_website']}"
+        )
+
+def render_sections_headers():
+    for key, anchor in SECTIONS.items():
+        st.header(SECTION_TITLES[key], anchor=anchor)
+        _render_section_content(key)
+
+def render_sections_expanders():
+    for key, anchor in SECTIONS.items():
+        st.markdown(f"<div id='{anchor}'></div>", unsafe_allow_html=True)
+        with st.expander(SECTION_TITLES[key]):
+            _render_section_content(key)
+
+def render_sections_hidden():
+    # No visible content, but the anchor IDs still exist as targets for the
+    # chatbot's links.
+    st.markdown(_ANCHORS_HTML, unsafe_allow_html=True)
+
+_SECTION_RENDERERS = {
+    "headers": render_sections_headers,
+    "expander": render_sections_expanders,
+    "hidden": render_sections_hidden,
+}
 
-st.markdown("<div id='about-jash'></div>", unsafe_allow_html=True)
-st.markdown("<div id='my-skills'></div>", unsafe_allow_html=True)
-st.markdown("<div id='my-education'></div>", unsafe_allow_html=True)
-st.markdown("<div id='my-projects'></div>", unsafe_allow_html=True)
-st.markdown("<div id='contact-jash'></div>", unsafe_allow_html=True)
+_SECTION_RENDERERS.get(DISPLAY_MODE, render_sections_hidden)()
 
 
 # Option to manually trigger a reload of personal info (in sidebar)
 st.sidebar.markdown("---")
 st.sidebar.header("App Management")
 if st.sidebar.button("Reload Personal Info"):
-    st.cache_data.clear()
+    load_personal_info.clear()
+    _build_static_prompt.clear()
+    _response_cache.clear()
     st.rerun()
     st.sidebar.success("Personal information reloaded!")
\ No newline at end of file